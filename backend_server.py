@@ -1,35 +1,214 @@
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, WebSocket
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 import asyncio
-import uuid
-import json
-from typing import Optional, Dict, Any
-import numpy as np
-from PIL import Image
+import contextlib
+import functools
 import io
-import requests
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from enum import IntEnum
+from typing import Optional, Dict, Any, BinaryIO
+import numpy as np
+import httpx
+from ulid import ULID
 import os
+import msgspec
+import orjson
+import redis.asyncio as redis
+import trt_engine
+from trt_engine import TRTEngine, MODEL_FILES
+from batching import DynamicBatcher
+import preproc
+
+class APIGZipMiddleware(GZipMiddleware):
+    """GZip API responses, leaving already-compressed GLB/JPEG assets untouched"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/assets/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+class UploadSizeLimitMiddleware:
+    """Cap avatar upload bodies before Starlette parses them into spooled files
+    
+    Requests declaring a larger Content-Length are refused up front; chunked
+    ones are cut off with a 413 as soon as their body passes the limit.
+    """
+    
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+    
+    async def __call__(self, scope, receive, send):
+        if not (scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == "/api/v1/process-avatar"):
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_size:
+            response = ORJSONResponse({"detail": "Photo too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    # Raised mid-parse; FastAPI passes HTTPExceptions from body parsing through
+                    raise HTTPException(status_code=413, detail="Photo too large")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+app = FastAPI(title="MirrorWorld AI Backend", version="1.0.0", default_response_class=ORJSONResponse)
+# Completed status responses carry ~1-2 KB of repetitive assets metadata
+app.add_middleware(APIGZipMiddleware, minimum_size=512, compresslevel=5)
+
+# Job state lives in Redis so every worker and replica sees the same jobs
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+JOB_TTL = int(os.environ.get("JOB_TTL", 24 * 60 * 60))  # seconds
+redis_client = redis.from_url(REDIS_URL)
+# Status streams re-check a job that has published nothing for this long, and
+# close if it still hasn't changed; clients can fall back to polling the status
+STATUS_STREAM_IDLE_TIMEOUT = float(os.environ.get("STATUS_STREAM_IDLE_TIMEOUT", 30))  # seconds
+
+# Oversized uploads are refused while their body is received, before Starlette
+# parses the form; the allowance covers the config field and multipart framing
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 20 * 1024 * 1024))
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+app.add_middleware(UploadSizeLimitMiddleware, max_size=MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD)
+
+# Jobs wait in a bounded queue for a fixed pool of pipeline workers
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 64))
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", os.cpu_count() or 1))
+
+# Server processes. Each one loads every TensorRT engine onto the GPU, so
+# keep this at 1-2 per GPU and scale with more GPUs/replicas instead.
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", min(os.cpu_count() or 1, 2)))
+
+# Decoding and preprocessing run in a process pool so they never hold the event loop's GIL.
+# The cores are split between the server processes' pools.
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1)))
 
-app = FastAPI(title="MirrorWorld AI Backend", version="1.0.0")
+# Generated assets are served straight from disk, laid out as <job_id>/<filename>
+ASSETS_DIR = os.environ.get("ASSETS_DIR", "assets")
 
-# In-memory job storage (use Redis in production)
-jobs: Dict[str, Dict[str, Any]] = {}
+# TensorRT engine precision for the GPU stages, "fp16" or "int8"
+PRECISION = os.environ.get("PRECISION", "fp16")
+
+# Concurrent jobs' images are batched into one engine call per model.
+# Tune the batch size against a measured batch-size vs. throughput curve.
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 4))
+MAX_BATCH_WAIT_MS = float(os.environ.get("MAX_BATCH_WAIT_MS", 10))
+
+# Jobs this process is queueing or running; Redis holds the shared copy
+jobs: Dict[str, "JobState"] = {}
+
+# Serializes status writes of a job's concurrently running stages, keyed by job_id
+job_locks: Dict[str, asyncio.Lock] = {}
+
+# Engines are loaded once at startup and only used from the TensorRT threads
+engines: Dict[str, TRTEngine] = {}
+batchers: Dict[str, DynamicBatcher] = {}
+trt_executor: Optional[ThreadPoolExecutor] = None
 
 class JobStatus(BaseModel):
     job_id: str
     current_stage: str
     progress: float
     is_completed: bool
-    assets: Optional[Dict[str, str]] = None
+    assets: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
+class Stage(IntEnum):
+    """Index of each pipeline stage in ProcessingPipeline.STAGES"""
+    UPLOADING = 0
+    SEGMENTATION = 1
+    DEPTH_ANALYSIS = 2
+    MESH_GENERATION = 3
+    TEXTURE_MAPPING = 4
+    RIGGING = 5
+    ANIMATION = 6
+    UNITY_PREP = 7
+    COMPLETED = 8
+
+class JobState(msgspec.Struct):
+    """A job's status, stored in Redis as msgpack"""
+    status: str
+    current_stage: str = "uploading"
+    progress: float = 0.1
+    is_completed: bool = False
+    error: Optional[str] = None
+    assets: Optional[Dict[str, Any]] = None
+    
+    def advance(self, stage: Stage):
+        """Move the job to a pipeline stage"""
+        self.current_stage, _, self.progress = ProcessingPipeline.STAGES[stage]
+
+job_state_encoder = msgspec.msgpack.Encoder()
+job_state_decoder = msgspec.msgpack.Decoder(JobState)
+
+def job_events_channel(job_id: str) -> str:
+    """Redis pub/sub channel carrying a job's status updates"""
+    return f"job:{job_id}:events"
+
+async def save_job(job_id: str, fields: Optional[Dict[str, Any]] = None, stage: Optional[Stage] = None):
+    """Apply field changes and/or a stage transition to a local job, then store and publish it"""
+    state = jobs[job_id]
+    if stage is not None:
+        state.advance(stage)
+    for name, value in (fields or {}).items():
+        setattr(state, name, value)
+    
+    async with job_locks.get(job_id) or contextlib.nullcontext():
+        # Encode under the lock so the last write always carries the latest state
+        blob = job_state_encoder.encode(state)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(f"job:{job_id}", blob, ex=JOB_TTL)
+            pipe.publish(job_events_channel(job_id), blob)
+            await pipe.execute()
+
+async def load_job(job_id: str) -> Optional[JobState]:
+    """Read a job's state from Redis, None if it doesn't exist"""
+    blob = await redis_client.get(f"job:{job_id}")
+    if blob is None:
+        return None
+    return job_state_decoder.decode(blob)
+
+def job_status(job_id: str, job: JobState) -> JobStatus:
+    """Status API view of a job's state"""
+    # Built from trusted internal state, so skip validation
+    return JobStatus.model_construct(
+        job_id=job_id,
+        current_stage=job.current_stage,
+        progress=job.progress,
+        is_completed=job.is_completed,
+        assets=job.assets,
+        error=job.error
+    )
+
+def run_model_batch(name: str, tensors: list) -> np.ndarray:
+    """Run a batch of preprocessed CxHxW tensors through a TensorRT engine, must be called on a TensorRT thread"""
+    engine = engines[name]
+    with engine.slot() as slot:
+        for i, x in enumerate(tensors):
+            slot.h_input[i] = x
+        return slot.infer(len(tensors))
+
 class ProcessingPipeline:
     """RenderNet + PIKE inspired AI pipeline for 3D avatar generation"""
     
-    STAGES = [
+    STAGES = (
         ("uploading", "Uploading to backend...", 0.1),
         ("segmentation", "MODNet person segmentation...", 0.2),
         ("depth_analysis", "MiDaS depth estimation...", 0.3),
@@ -39,26 +218,34 @@ class ProcessingPipeline:
         ("animation", "Injecting breathing & micro-motions...", 0.9),
         ("unity_prep", "Preparing for Unity import...", 0.95),
         ("completed", "Ready for 3D world!", 1.0)
-    ]
+    )
     
     @staticmethod
-    async def process_image(job_id: str, image_data: bytes, config: dict):
-        """Main processing pipeline"""
+    async def process_image(job_id: str, image: BinaryIO, config: dict):
+        """Main processing pipeline, takes ownership of the uploaded image file"""
+        job_locks[job_id] = asyncio.Lock()
         try:
             # Initialize job
-            jobs[job_id] = {
+            await save_job(job_id, {
                 "status": "processing",
-                "current_stage": "uploading",
-                "progress": 0.1,
                 "is_completed": False,
                 "error": None
-            }
+            }, stage=Stage.UPLOADING)
             
-            # Step 1: Person Segmentation (MODNet)
-            await ProcessingPipeline.segment_person(job_id, image_data)
+            # Decode the upload once and preprocess it for every loaded model in the CPU pool
+            image.seek(0)
+            input_sizes = {name: engine.input_size for name, engine in engines.items()}
+            loop = asyncio.get_running_loop()
+            # Uploads past 1 MB are spooled to disk, so read them off the event loop too
+            data = await loop.run_in_executor(None, image.read)
+            inputs = await loop.run_in_executor(app.state.cpu_pool, preproc.prepare_inputs, data, input_sizes)
             
-            # Step 2: Depth Estimation (MiDaS/ZoeDepth)
-            await ProcessingPipeline.estimate_depth(job_id, image_data)
+            # Steps 1 & 2: Person Segmentation (MODNet) and Depth Estimation (MiDaS/ZoeDepth)
+            # only depend on the input image, so they run concurrently
+            matte, depth = await asyncio.gather(
+                ProcessingPipeline.segment_person(job_id, inputs),
+                ProcessingPipeline.estimate_depth(job_id, inputs)
+            )
             
             # Step 3: 3D Mesh Generation (RenderNet)
             await ProcessingPipeline.generate_3d_mesh(job_id)
@@ -73,9 +260,7 @@ class ProcessingPipeline:
             await ProcessingPipeline.prepare_for_unity(job_id)
             
             # Complete
-            jobs[job_id].update({
-                "current_stage": "completed",
-                "progress": 1.0,
+            await save_job(job_id, {
                 "is_completed": True,
                 "assets": {
                     "modelURL": f"https://api.mirrorworld-backend.replit.app/assets/{job_id}/model.glb",
@@ -101,56 +286,55 @@ class ProcessingPipeline:
                         }
                     }
                 }
-            })
+            }, stage=Stage.COMPLETED)
             
         except Exception as e:
-            jobs[job_id].update({
+            await save_job(job_id, {
                 "error": str(e),
                 "is_completed": True
             })
+        finally:
+            image.close()
+            job_locks.pop(job_id, None)
+            jobs.pop(job_id, None)
     
     @staticmethod
-    async def segment_person(job_id: str, image_data: bytes):
-        """Step 1: MODNet person segmentation"""
-        jobs[job_id].update({
-            "current_stage": "segmentation",
-            "progress": 0.2
-        })
+    async def segment_person(job_id: str, inputs: Dict[str, np.ndarray]) -> Optional[np.ndarray]:
+        """Step 1: MODNet person segmentation, returns the alpha matte"""
+        await save_job(job_id, stage=Stage.SEGMENTATION)
         
-        # Simulate MODNet processing
-        await asyncio.sleep(2)
-        
-        # In real implementation:
-        # - Load MODNet model
-        # - Process image to remove background
-        # - Extract person silhouette with high precision
+        matte = None
+        if "modnet" in batchers:
+            matte = await batchers["modnet"].submit(inputs["modnet"])
+        else:
+            # Simulate MODNet processing
+            await asyncio.sleep(2)
         
         print(f"[{job_id}] Person segmentation completed")
+        return matte
     
     @staticmethod
-    async def estimate_depth(job_id: str, image_data: bytes):
-        """Step 2: MiDaS/ZoeDepth depth estimation"""
-        jobs[job_id].update({
-            "current_stage": "depth_analysis",
-            "progress": 0.3
-        })
+    async def estimate_depth(job_id: str, inputs: Dict[str, np.ndarray]) -> Optional[np.ndarray]:
+        """Step 2: MiDaS/ZoeDepth depth estimation, returns the relative depth map"""
+        await save_job(job_id, stage=Stage.DEPTH_ANALYSIS)
         
-        await asyncio.sleep(3)
+        depth = None
+        if "midas" in batchers:
+            depth = await batchers["midas"].submit(inputs["midas"])
+        else:
+            # Simulate MiDaS processing
+            await asyncio.sleep(3)
         
         # In real implementation:
-        # - Load MiDaS or ZoeDepth model
-        # - Generate depth map
         # - Analyze facial geometry and body structure
         
         print(f"[{job_id}] Depth estimation completed")
+        return depth
     
     @staticmethod
     async def generate_3d_mesh(job_id: str):
         """Step 3: RenderNet 3D mesh generation"""
-        jobs[job_id].update({
-            "current_stage": "mesh_generation",
-            "progress": 0.5
-        })
+        await save_job(job_id, stage=Stage.MESH_GENERATION)
         
         await asyncio.sleep(4)
         
@@ -164,10 +348,7 @@ class ProcessingPipeline:
     @staticmethod
     async def apply_textures(job_id: str):
         """Step 4: PIKE texture mapping"""
-        jobs[job_id].update({
-            "current_stage": "texture_mapping",
-            "progress": 0.7
-        })
+        await save_job(job_id, stage=Stage.TEXTURE_MAPPING)
         
         await asyncio.sleep(3)
         
@@ -181,17 +362,11 @@ class ProcessingPipeline:
     @staticmethod
     async def add_animations(job_id: str):
         """Step 5: Add facial rigging and animations"""
-        jobs[job_id].update({
-            "current_stage": "rigging",
-            "progress": 0.8
-        })
+        await save_job(job_id, stage=Stage.RIGGING)
         
         await asyncio.sleep(2)
         
-        jobs[job_id].update({
-            "current_stage": "animation",
-            "progress": 0.9
-        })
+        await save_job(job_id, stage=Stage.ANIMATION)
         
         await asyncio.sleep(2)
         
@@ -206,10 +381,7 @@ class ProcessingPipeline:
     @staticmethod
     async def prepare_for_unity(job_id: str):
         """Step 6: Unity preparation"""
-        jobs[job_id].update({
-            "current_stage": "unity_prep",
-            "progress": 0.95
-        })
+        await save_job(job_id, stage=Stage.UNITY_PREP)
         
         await asyncio.sleep(1)
         
@@ -220,6 +392,71 @@ class ProcessingPipeline:
         
         print(f"[{job_id}] Unity preparation completed")
 
+async def worker_loop(queue: asyncio.Queue):
+    """Long-lived worker that runs queued jobs through the pipeline one at a time"""
+    while True:
+        job = await queue.get()
+        try:
+            await ProcessingPipeline.process_image(**job)
+        except Exception as e:
+            print(f"[{job['job_id']}] Pipeline worker error: {e}")
+        finally:
+            queue.task_done()
+
+async def load_engines():
+    """Load the prebuilt TensorRT engine of every model that has one for this GPU"""
+    global trt_executor
+    if not trt_engine.available():
+        print("TensorRT not available, using simulated segmentation and depth stages")
+        return
+    
+    # A thread per engine slot, all sharing the device's CUDA context
+    trt_executor = ThreadPoolExecutor(
+        max_workers=trt_engine.NUM_STREAMS * len(MODEL_FILES),
+        thread_name_prefix="trt",
+        initializer=trt_engine.init_cuda
+    )
+    loop = asyncio.get_running_loop()
+    for name in MODEL_FILES:
+        engine = await loop.run_in_executor(trt_executor, TRTEngine.load, name, PRECISION)
+        if engine is None:
+            print(f"No TensorRT engine for {name}, using simulated stage (run build_engines.py)")
+            continue
+        engines[name] = engine
+        batchers[name] = DynamicBatcher(
+            functools.partial(run_model_batch, name),
+            executor=trt_executor,
+            max_batch=min(MAX_BATCH_SIZE, engine.max_batch_size),
+            max_wait_ms=MAX_BATCH_WAIT_MS,
+            max_in_flight=len(engine.slots)
+        )
+        batchers[name].start()
+        print(f"Loaded TensorRT engine for {name} (max batch {batchers[name].max_batch})")
+
+@app.on_event("startup")
+async def startup():
+    """Load model engines, open shared clients and start the pipeline worker pools"""
+    await load_engines()
+    if preproc.tj is None:
+        print("libjpeg-turbo not found, decoding JPEG uploads with PIL")
+    # Spawned rather than forked, the parent already has CUDA and executor threads running
+    app.state.cpu_pool = ProcessPoolExecutor(
+        max_workers=CPU_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=preproc.init_worker
+    )
+    # One pooled HTTP/2 client for all outbound calls to model services
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100)
+    )
+    app.state.queue = asyncio.Queue(maxsize=JOB_QUEUE_SIZE)
+    app.state.workers = [
+        asyncio.create_task(worker_loop(app.state.queue))
+        for _ in range(PIPELINE_WORKERS)
+    ]
+
 @app.post("/api/v1/process-avatar")
 async def process_avatar(
     photo: UploadFile = File(...),
@@ -227,47 +464,128 @@ async def process_avatar(
 ):
     """Start avatar generation pipeline"""
     try:
-        # Generate unique job ID
-        job_id = str(uuid.uuid4())
+        # Generate unique, time-sortable job ID
+        job_id = str(ULID())
         
-        # Read image data
-        image_data = await photo.read()
-        config_dict = json.loads(config)
+        config_dict = orjson.loads(config)
         
-        # Start processing in background
-        asyncio.create_task(ProcessingPipeline.process_image(job_id, image_data, config_dict))
+        # Backstop for the middleware's limit, which also counts the form overhead
+        if photo.size is not None and photo.size > MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=413, detail="Photo too large")
+        
+        # Take over Starlette's spooled upload file instead of copying it; FastAPI
+        # closes the form's files after the response, so leave it an empty one
+        image, photo.file = photo.file, io.BytesIO()
+        image.seek(0)
+        
+        # Queue for background processing, shedding load when the queue is full
+        if app.state.queue.full():
+            image.close()
+            raise HTTPException(status_code=429, detail="Too many avatars in progress, try again later")
+        
+        jobs[job_id] = JobState(status="queued")
+        try:
+            await save_job(job_id, stage=Stage.UPLOADING)
+            app.state.queue.put_nowait({"job_id": job_id, "image": image, "config": config_dict})
+        except BaseException as e:
+            # Nothing will pick the job up, so don't leave its state or upload behind
+            image.close()
+            jobs.pop(job_id, None)
+            with contextlib.suppress(Exception):
+                await redis_client.delete(f"job:{job_id}")
+            if isinstance(e, asyncio.QueueFull):
+                raise HTTPException(status_code=429, detail="Too many avatars in progress, try again later")
+            raise
         
-        return JSONResponse({
+        return ORJSONResponse({
             "jobId": job_id,
             "estimatedTime": 120,  # seconds
             "message": "Avatar generation started"
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/status/{job_id}")
+@app.get("/api/v1/status/{job_id}", responses={200: {"model": JobStatus}})
 async def get_processing_status(job_id: str):
     """Get processing status for a job"""
-    if job_id not in jobs:
+    job = await load_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    return JobStatus(
-        job_id=job_id,
-        current_stage=job["current_stage"],
-        progress=job["progress"],
-        is_completed=job["is_completed"],
-        assets=job.get("assets"),
-        error=job.get("error")
-    )
+    # Returned as a response so FastAPI doesn't run jsonable_encoder over the assets
+    return ORJSONResponse(job_status(job_id, job).model_dump())
+
+async def wait_for_disconnect(websocket: WebSocket):
+    """Return once the client disconnects, discarding anything it sends"""
+    with contextlib.suppress(Exception):
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+@app.websocket("/api/v1/status/{job_id}")
+async def stream_processing_status(websocket: WebSocket, job_id: str):
+    """Push a job's status on connect and after every update until it completes"""
+    await websocket.accept()
+    # Nothing else reads from the socket, so watch for the client going away
+    disconnected = asyncio.create_task(wait_for_disconnect(websocket))
+    try:
+        async with redis_client.pubsub() as pubsub:
+            # Subscribe before reading the snapshot so no update is missed in between
+            await pubsub.subscribe(job_events_channel(job_id))
+            # subscribe() only sends SUBSCRIBE; read its confirmation here so the
+            # loop below doesn't mistake it for an idle timeout
+            await pubsub.get_message(timeout=STATUS_STREAM_IDLE_TIMEOUT)
+            job = await load_job(job_id)
+            while job is not None:
+                await websocket.send_bytes(orjson.dumps(job_status(job_id, job).model_dump()))
+                if job.is_completed:
+                    break
+                
+                # Every event carries the job's full state
+                message = asyncio.create_task(
+                    pubsub.get_message(ignore_subscribe_messages=True, timeout=STATUS_STREAM_IDLE_TIMEOUT)
+                )
+                await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    message.cancel()
+                    return
+                if message.result() is not None:
+                    job = job_state_decoder.decode(message.result()["data"])
+                    continue
+                
+                # Nothing published for a while: re-read the job so one that expired,
+                # or whose worker died without a final event, doesn't hold the socket
+                latest = await load_job(job_id)
+                if latest == job:
+                    await websocket.close(code=4408, reason="Job stalled")
+                    return
+                job = latest
+        
+        if job is None:
+            await websocket.close(code=4404, reason="Job not found")
+        else:
+            await websocket.close()
+    finally:
+        disconnected.cancel()
 
-@app.get("/assets/{job_id}/{filename}")
-async def get_asset(job_id: str, filename: str):
-    """Serve generated assets"""
-    # In real implementation, serve actual files
-    # For now, return placeholder response
-    return JSONResponse({"message": f"Asset {filename} for job {job_id}"})
+# Static file serving streams assets from disk in chunks instead of buffering them
+# in Python. In production, Nginx can serve ASSETS_DIR at /assets/ ahead of the app.
+os.makedirs(ASSETS_DIR, exist_ok=True)
+app.mount("/assets", StaticFiles(directory=ASSETS_DIR), name="assets")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop pipeline workers and release shared connections"""
+    for worker in app.state.workers:
+        worker.cancel()
+    await asyncio.gather(*app.state.workers, return_exceptions=True)
+    for batcher in batchers.values():
+        await batcher.stop()
+    app.state.cpu_pool.shutdown(cancel_futures=True)
+    await app.state.http.aclose()
+    await redis_client.aclose()
 
 @app.get("/health")
 async def health_check():
@@ -276,4 +594,14 @@ async def health_check():
 
 if __name__ == "__main__":
     # Run on 0.0.0.0 to be accessible from Replit
-    uvicorn.run(app, host="0.0.0.0", port=5000)
+    # uvloop + httptools, WEB_CONCURRENCY worker processes; production runs
+    # under gunicorn instead, see gunicorn.conf.py
+    uvicorn.run(
+        "backend_server:app",
+        host="0.0.0.0",
+        port=5000,
+        loop="uvloop",
+        http="httptools",
+        workers=WEB_CONCURRENCY,
+        limit_concurrency=int(os.environ.get("LIMIT_CONCURRENCY", 256))
+    )
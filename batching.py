@@ -0,0 +1,84 @@
+"""Dynamic batching of concurrent inference requests"""
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Sequence
+
+class DynamicBatcher:
+    """Collects concurrent submits into batches for a single model call
+
+    A batch is dispatched once it holds max_batch items or max_wait_ms has
+    passed since its first item arrived, so a lone request waits at most
+    max_wait_ms. Up to max_in_flight batches run at once, letting e.g. one
+    batch's transfers overlap another's compute. Pick max_batch from a
+    batch-size vs. throughput measurement, below the point where larger
+    batches stop paying off.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Sequence[Any]],
+        executor: Optional[Executor] = None,
+        max_batch: int = 4,
+        max_wait_ms: float = 10.0,
+        max_in_flight: int = 1
+    ):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._task: Optional[asyncio.Task] = None
+        self._batches: set = set()
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        self._task = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """Stop the batching loop"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._batches, return_exceptions=True)
+
+    async def submit(self, x: Any) -> Any:
+        """Queue one input and wait for its slice of the batched result"""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((x, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first so the next batch fills up meanwhile
+            await self._in_flight.acquire()
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = asyncio.create_task(self._run(items))
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+
+    async def _run(self, items: list):
+        loop = asyncio.get_running_loop()
+        try:
+            outputs = await loop.run_in_executor(self.executor, self.run_batch, [x for x, _ in items])
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._in_flight.release()
+
+        for (_, future), output in zip(items, outputs):
+            if not future.done():
+                future.set_result(output)
@@ -0,0 +1,124 @@
+"""Build TensorRT engines for the pipeline models ahead of time
+
+Run once per GPU architecture, normally as a Dockerfile step, on a host
+with that GPU. Engines are written to ENGINE_DIR keyed by the GPU's SM:
+
+    python build_engines.py --precision fp16
+    python build_engines.py --precision int8 --calibration-dir calibration_images
+
+With --require-all, a missing ONNX model is an error instead of a skip.
+"""
+import argparse
+import os
+
+import numpy as np
+
+import trt_engine
+from trt_engine import trt, cuda, MODEL_DIR, ENGINE_DIR, MODEL_FILES
+from preproc import decode_image, preprocess, MODEL_NORMALIZATION
+
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+class EntropyCalibrator(trt.IInt8EntropyCalibrator2 if trt else object):
+    """Feeds preprocessed user photos to TensorRT's INT8 entropy calibration"""
+
+    def __init__(self, image_dir: str, input_shape: tuple, mean: np.ndarray, std: np.ndarray, cache_path: str):
+        super().__init__()
+        self.paths = sorted(
+            os.path.join(image_dir, filename)
+            for filename in os.listdir(image_dir)
+            if filename.lower().endswith(CALIBRATION_EXTENSIONS)
+        )
+        if len(self.paths) < input_shape[0]:
+            raise SystemExit(
+                f"INT8 calibration needs at least {input_shape[0]} images in {image_dir}, found {len(self.paths)}"
+            )
+        self.mean = mean
+        self.std = std
+        self.cache_path = cache_path
+        self.index = 0
+        self.h_batch = np.empty(input_shape, dtype=np.float32)
+        self.d_batch = cuda.mem_alloc(self.h_batch.nbytes)
+
+    def get_batch_size(self) -> int:
+        return self.h_batch.shape[0]
+
+    def get_batch(self, names):
+        batch_size = self.get_batch_size()
+        if self.index + batch_size > len(self.paths):
+            return None
+
+        # Decoded like uploads, EXIF orientation included, so calibration sees what production does
+        for i, path in enumerate(self.paths[self.index:self.index + batch_size]):
+            with open(path, "rb") as f:
+                preprocess(decode_image(f.read()), self.h_batch[i], self.mean, self.std)
+        self.index += batch_size
+
+        cuda.memcpy_htod(self.d_batch, self.h_batch)
+        return [int(self.d_batch)]
+
+    def read_calibration_cache(self):
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, "rb") as f:
+                return f.read()
+        return None
+
+    def write_calibration_cache(self, cache):
+        with open(self.cache_path, "wb") as f:
+            f.write(cache)
+
+def calibration_input_shape(onnx_path: str) -> tuple:
+    """Input shape calibration batches must have, the engine's opt profile shape"""
+    network_input = trt_engine.onnx_input_shape(onnx_path)
+    if network_input[0] == -1:
+        return (trt_engine.MAX_BATCH_SIZE, *network_input[1:])
+    return network_input
+
+def main():
+    parser = argparse.ArgumentParser(description="Build TensorRT engines for the pipeline models")
+    parser.add_argument("--precision", choices=["fp16", "int8"], default="fp16")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--engine-dir", default=ENGINE_DIR)
+    parser.add_argument("--calibration-dir", default="calibration_images")
+    parser.add_argument("--require-all", action="store_true", help="fail unless every model's engine is built")
+    args = parser.parse_args()
+
+    if not trt_engine.available():
+        raise SystemExit("TensorRT and PyCUDA are required to build engines")
+    trt_engine.init_cuda()
+    # TensorRT tunes for the GPU doing the build, so its SM is the one engines are keyed by
+    sm = trt_engine.device_sm()
+    os.makedirs(args.engine_dir, exist_ok=True)
+
+    built = 0
+    for name, filename in MODEL_FILES.items():
+        onnx_path = os.path.join(args.model_dir, filename)
+        if not os.path.exists(onnx_path):
+            if args.require_all:
+                raise SystemExit(f"Cannot build {name}: {onnx_path} not found")
+            print(f"Skipping {name}: {onnx_path} not found")
+            continue
+
+        calibrator = None
+        if args.precision == "int8":
+            mean, std = MODEL_NORMALIZATION[name]
+            calibrator = EntropyCalibrator(
+                args.calibration_dir,
+                calibration_input_shape(onnx_path),
+                mean,
+                std,
+                cache_path=f"{onnx_path}.int8.calib"
+            )
+
+        engine_path = trt_engine.engine_path_for(name, sm, args.precision, args.engine_dir)
+        trt_engine.build_engine(onnx_path, engine_path, args.precision, calibrator)
+        print(f"Built {engine_path}")
+        built += 1
+
+    if built == 0:
+        print("No engines built, the server will run its simulated stages")
+        if args.require_all:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Production server settings
+
+    gunicorn -c gunicorn.conf.py backend_server:app
+"""
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+# Every worker loads its own copy of the TensorRT engines and CUDA context, so
+# GPU memory, not cores, bounds this: 1-2 workers per GPU, more replicas beyond that
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 2)))
+# Workers size their CPU process pools from this to split the cores between them
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+class LimitedUvicornWorker(UvicornWorker):
+    """Uvicorn worker answering 503 past LIMIT_CONCURRENCY open connections and tasks"""
+    
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "limit_concurrency": int(os.environ.get("LIMIT_CONCURRENCY", 256))}
+
+# Picks up uvloop and httptools automatically when installed
+worker_class = LimitedUvicornWorker
+# Import the app once in the master so workers share its read-only pages copy-on-write.
+# CUDA, executors and pools are only created in each worker's startup event, after the fork.
+preload_app = True
@@ -0,0 +1,110 @@
+"""Image decoding and fused preprocessing for the TensorRT models
+
+The server runs these in its CPU process pool, off the event loop.
+"""
+import io
+from typing import Dict
+
+import numba
+import numpy as np
+from numba import njit, prange
+from PIL import Image, ImageOps
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    tj = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    # libjpeg-turbo not installed, JPEGs are decoded with PIL
+    tj = None
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+EXIF_ORIENTATION = 0x0112
+
+# Array equivalents of ImageOps.exif_transpose for each EXIF orientation
+ORIENTATION_TRANSFORMS = {
+    2: lambda a: a[:, ::-1],
+    3: lambda a: a[::-1, ::-1],
+    4: lambda a: a[::-1],
+    5: lambda a: a.transpose(1, 0, 2),
+    6: lambda a: np.rot90(a, -1),
+    7: lambda a: a.transpose(1, 0, 2)[::-1, ::-1],
+    8: lambda a: np.rot90(a),
+}
+
+# (mean, std) per RGB channel each model was trained with
+MODEL_NORMALIZATION = {
+    "modnet": (np.array([0.5, 0.5, 0.5], np.float32), np.array([0.5, 0.5, 0.5], np.float32)),
+    "midas": (np.array([0.485, 0.456, 0.406], np.float32), np.array([0.229, 0.224, 0.225], np.float32)),
+}
+
+@njit(parallel=True, fastmath=True, nogil=True, cache=True)
+def preprocess(src_u8: np.ndarray, dst_f32: np.ndarray, mean: np.ndarray, std: np.ndarray):
+    """Resize, normalize and transpose an image in a single pass
+
+    Bilinearly samples the HxWx3 uint8 `src_u8` at the size of `dst_f32`,
+    scales to [0, 1], applies per-channel (x - mean) / std and writes the
+    result in CxHxW layout into `dst_f32`, which may be a slice of a pinned
+    TensorRT input buffer.
+    """
+    src_h, src_w = src_u8.shape[0], src_u8.shape[1]
+    dst_h, dst_w = dst_f32.shape[1], dst_f32.shape[2]
+    scale_y = src_h / dst_h
+    scale_x = src_w / dst_w
+
+    # x / 255 then (x - mean) / std folded into one multiply-add per channel
+    gain = np.empty(3, np.float32)
+    bias = np.empty(3, np.float32)
+    for c in range(3):
+        gain[c] = 1.0 / (255.0 * std[c])
+        bias[c] = mean[c] / std[c]
+
+    for y in prange(dst_h):
+        fy = min(max((y + 0.5) * scale_y - 0.5, 0.0), src_h - 1.0)
+        y0 = int(fy)
+        y1 = min(y0 + 1, src_h - 1)
+        wy = fy - y0
+        for x in range(dst_w):
+            fx = min(max((x + 0.5) * scale_x - 0.5, 0.0), src_w - 1.0)
+            x0 = int(fx)
+            x1 = min(x0 + 1, src_w - 1)
+            wx = fx - x0
+            for c in range(3):
+                top = src_u8[y0, x0, c] * (1.0 - wx) + src_u8[y0, x1, c] * wx
+                bottom = src_u8[y1, x0, c] * (1.0 - wx) + src_u8[y1, x1, c] * wx
+                dst_f32[c, y, x] = (top * (1.0 - wy) + bottom * wy) * gain[c] - bias[c]
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode an uploaded image into an RGB uint8 array"""
+    if tj is not None and data.startswith(JPEG_MAGIC):
+        # libjpeg-turbo's SIMD decoder writes RGB straight into a NumPy array,
+        # but ignores EXIF, so apply the camera's orientation here. PIL only
+        # parses the headers for this, it doesn't decode the pixels.
+        with Image.open(io.BytesIO(data)) as img:
+            orientation = img.getexif().get(EXIF_ORIENTATION)
+        rgb = tj.decode(data, pixel_format=TJPF_RGB)
+        if orientation in ORIENTATION_TRANSFORMS:
+            rgb = np.ascontiguousarray(ORIENTATION_TRANSFORMS[orientation](rgb))
+        return rgb
+
+    with Image.open(io.BytesIO(data)) as img:
+        return np.asarray(ImageOps.exif_transpose(img).convert("RGB"))
+
+def prepare_inputs(data: bytes, input_sizes: Dict[str, tuple]) -> Dict[str, np.ndarray]:
+    """Decode an upload once and preprocess it for each model's (height, width)"""
+    rgb = decode_image(data)
+    inputs = {}
+    for name, (height, width) in input_sizes.items():
+        mean, std = MODEL_NORMALIZATION[name]
+        inputs[name] = np.empty((3, height, width), dtype=np.float32)
+        preprocess(rgb, inputs[name], mean, std)
+    return inputs
+
+def init_worker():
+    """CPU pool initializer: compile the kernel once and keep each process single-threaded
+
+    The pool already spreads jobs across cores, so Numba's own threads would
+    only oversubscribe them.
+    """
+    numba.set_num_threads(1)
+    mean, std = MODEL_NORMALIZATION["midas"]
+    preprocess(np.zeros((2, 2, 3), np.uint8), np.empty((3, 2, 2), np.float32), mean, std)
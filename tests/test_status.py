@@ -0,0 +1,44 @@
+"""Status endpoint responses"""
+from fastapi.testclient import TestClient
+
+import backend_server
+from backend_server import JobState, JobStatus, Stage, app
+
+ASSETS = {
+    "modelURL": "https://api.mirrorworld-backend.replit.app/assets/job/model.glb",
+    "metadata": {"bodyMeasurements": {"height": 1.75}, "animations": ["idle", "walk"]}
+}
+
+def test_job_state_carries_every_status_field():
+    assert set(JobStatus.model_fields) - {"job_id"} <= set(JobState.__struct_fields__)
+
+def test_completed_job_status_matches_validated_model(monkeypatch):
+    job = JobState(status="processing", is_completed=True, assets=ASSETS)
+    job.advance(Stage.COMPLETED)
+
+    async def load_job(job_id):
+        return job
+
+    monkeypatch.setattr(backend_server, "load_job", load_job)
+    response = TestClient(app).get("/api/v1/status/job")
+
+    assert response.status_code == 200
+    expected = JobStatus.model_validate({
+        "job_id": "job",
+        "current_stage": job.current_stage,
+        "progress": job.progress,
+        "is_completed": True,
+        "assets": ASSETS,
+        "error": None
+    })
+    assert response.json() == expected.model_dump()
+    assert JobStatus.model_validate(response.json()) == expected
+
+def test_missing_job_is_404(monkeypatch):
+    async def load_job(job_id):
+        return None
+
+    monkeypatch.setattr(backend_server, "load_job", load_job)
+    response = TestClient(app).get("/api/v1/status/missing")
+
+    assert response.status_code == 404
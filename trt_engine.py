@@ -0,0 +1,219 @@
+"""TensorRT engines for the MODNet/MiDaS pipeline stages"""
+import mmap
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+try:
+    import tensorrt as trt
+    import pycuda.driver as cuda
+except ImportError:
+    # GPU stack not installed (e.g. on Replit), pipeline falls back to simulated stages
+    trt = None
+    cuda = None
+
+TRT_LOGGER = trt.Logger(trt.Logger.WARNING) if trt else None
+WORKSPACE_SIZE = 1 << 30  # 1 GiB
+MAX_BATCH_SIZE = int(os.environ.get("TRT_MAX_BATCH_SIZE", 8))
+NUM_STREAMS = int(os.environ.get("TRT_STREAMS", 3))
+
+# ONNX exports of the pipeline models, and the engines prebuilt from them by build_engines.py
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+ENGINE_DIR = os.environ.get("ENGINE_DIR", "engines")
+MODEL_FILES = {"modnet": "modnet.onnx", "midas": "midas.onnx"}
+
+_cuda_context = None
+_cuda_context_lock = threading.Lock()
+
+def available() -> bool:
+    """Whether TensorRT and PyCUDA are importable"""
+    return trt is not None and cuda is not None
+
+def init_cuda(device: int = 0):
+    """Make the device's CUDA context current on the calling thread
+
+    Used as the initializer of the TensorRT executor threads, so the context
+    is created after any fork and shared by every thread that runs engines.
+    """
+    global _cuda_context
+    with _cuda_context_lock:
+        if _cuda_context is None:
+            cuda.init()
+            _cuda_context = cuda.Device(device).retain_primary_context()
+    _cuda_context.push()
+
+def device_sm(device: int = 0) -> str:
+    """GPU compute capability in the form engine files are keyed by, e.g. 86"""
+    major, minor = cuda.Device(device).compute_capability()
+    return f"{major}{minor}"
+
+def engine_path_for(name: str, sm: str, precision: str = "fp16", engine_dir: str = ENGINE_DIR) -> str:
+    """Engine file for a model built on one GPU architecture, e.g. engines/midas.sm86.fp16.engine
+
+    TensorRT engines only run on the architecture they were tuned on, so a
+    fleet with mixed GPUs ships one file per SM.
+    """
+    return os.path.join(engine_dir, f"{name}.sm{sm}.{precision}.engine")
+
+def parse_onnx(builder, onnx_path: str):
+    """Parse an ONNX model into an explicit-batch network, returns (network, parser)"""
+    network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+    parser = trt.OnnxParser(network, TRT_LOGGER)
+    with open(onnx_path, "rb") as f:
+        if not parser.parse(f.read()):
+            errors = [str(parser.get_error(i)) for i in range(parser.num_errors)]
+            raise RuntimeError(f"Failed to parse {onnx_path}: {errors}")
+    return network, parser
+
+def onnx_input_shape(onnx_path: str) -> tuple:
+    """NCHW shape of a model's image input, batch is -1 for dynamic exports"""
+    network, _ = parse_onnx(trt.Builder(TRT_LOGGER), onnx_path)
+    return tuple(network.get_input(0).shape)
+
+def build_engine(onnx_path: str, engine_path: str, precision: str = "fp16", calibrator=None) -> bytes:
+    """Build an FP16 or INT8 engine from an ONNX model and cache it on disk
+
+    INT8 builds need an IInt8Calibrator. FP16 stays enabled for them so
+    layers without an INT8 implementation fall back to FP16, not FP32.
+    """
+    builder = trt.Builder(TRT_LOGGER)
+    network, parser = parse_onnx(builder, onnx_path)
+
+    config = builder.create_builder_config()
+    config.set_memory_pool_limit(trt.MemoryPoolType.WORKSPACE, WORKSPACE_SIZE)
+    config.set_flag(trt.BuilderFlag.FP16)
+    if precision == "int8":
+        config.set_flag(trt.BuilderFlag.INT8)
+        config.int8_calibrator = calibrator
+
+    # Models exported with a dynamic batch axis get a 1..MAX_BATCH_SIZE profile
+    # per stream, since concurrent execution contexts can't share a profile
+    input_tensor = network.get_input(0)
+    _, channels, height, width = input_tensor.shape
+    if input_tensor.shape[0] == -1:
+        for i in range(NUM_STREAMS):
+            profile = builder.create_optimization_profile()
+            profile.set_shape(
+                input_tensor.name,
+                (1, channels, height, width),
+                (MAX_BATCH_SIZE, channels, height, width),
+                (MAX_BATCH_SIZE, channels, height, width)
+            )
+            config.add_optimization_profile(profile)
+            if i == 0 and precision == "int8":
+                config.set_calibration_profile(profile)
+
+    serialized = builder.build_serialized_network(network, config)
+    if serialized is None:
+        raise RuntimeError(f"Failed to build TensorRT engine for {onnx_path}")
+
+    with open(engine_path, "wb") as f:
+        f.write(serialized)
+    return bytes(serialized)
+
+class _Slot:
+    """One execution context with its own CUDA stream and pinned/device buffers"""
+
+    def __init__(self, engine, profile: int, input_shape: tuple):
+        self.context = engine.create_execution_context()
+        self.stream = cuda.Stream()
+
+        # Each optimization profile of a dynamic engine has its own copy of the
+        # bindings; static engines have one set that every context shares
+        self.dynamic = engine.get_binding_shape(0)[0] == -1
+        bindings_per_profile = engine.num_bindings // engine.num_optimization_profiles
+        self.input_index = profile * bindings_per_profile if self.dynamic else 0
+        self.output_index = self.input_index + 1
+        if self.dynamic:
+            self.context.set_optimization_profile_async(profile, self.stream.handle)
+            self.context.set_binding_shape(self.input_index, input_shape)
+
+        # Pinned host memory lets the async copies DMA without a staging buffer
+        self.h_input = cuda.pagelocked_empty(input_shape, dtype=np.float32)
+        self.h_output = cuda.pagelocked_empty(tuple(self.context.get_binding_shape(self.output_index)), dtype=np.float32)
+        self.d_input = cuda.mem_alloc(self.h_input.nbytes)
+        self.d_output = cuda.mem_alloc(self.h_output.nbytes)
+        self.bindings = [0] * engine.num_bindings
+        self.bindings[self.input_index] = int(self.d_input)
+        self.bindings[self.output_index] = int(self.d_output)
+
+    def infer(self, batch: int) -> np.ndarray:
+        """Run the first `batch` images already written to h_input"""
+        if self.dynamic:
+            self.context.set_binding_shape(self.input_index, (batch, *self.h_input.shape[1:]))
+        h_input = self.h_input[:batch]
+        h_output = self.h_output[:batch]
+        cuda.memcpy_htod_async(self.d_input, h_input, self.stream)
+        self.context.execute_async_v2(self.bindings, self.stream.handle)
+        cuda.memcpy_dtoh_async(h_output, self.d_output, self.stream)
+        self.stream.synchronize()
+        return h_output.copy()
+
+class TRTEngine:
+    """Deserialized TensorRT engine with a pool of per-stream execution slots
+
+    Calls on different slots overlap on the GPU, so one slot's host-to-device
+    copy runs while another computes. Use from threads that called init_cuda.
+    """
+
+    def __init__(self, serialized):
+        runtime = trt.Runtime(TRT_LOGGER)
+        self.engine = runtime.deserialize_cuda_engine(serialized)
+
+        # Binding 0 is the image tensor (NCHW), binding 1 the model output.
+        # Buffers are sized for the largest batch the engine accepts.
+        input_shape = tuple(self.engine.get_binding_shape(0))
+        num_slots = NUM_STREAMS
+        if input_shape[0] == -1:
+            # Concurrent contexts on a dynamic-shape engine each need their own profile
+            _, _, input_shape = self.engine.get_profile_shape(0, 0)
+            num_slots = min(NUM_STREAMS, self.engine.num_optimization_profiles)
+        self.input_shape = tuple(input_shape)
+
+        self.slots = [_Slot(self.engine, profile, self.input_shape) for profile in range(num_slots)]
+        self._free_slots: queue.Queue = queue.Queue()
+        for slot in self.slots:
+            self._free_slots.put(slot)
+
+    @classmethod
+    def load(cls, name: str, precision: str = "fp16") -> Optional["TRTEngine"]:
+        """Deserialize a model's prebuilt engine for this GPU, None if there isn't one
+
+        Engines are never built here; building takes minutes per process, so
+        build_engines.py does it once when the container image is built.
+        Without an INT8 engine the FP16 one is used instead.
+        """
+        sm = device_sm()
+        engine_path = engine_path_for(name, sm, precision)
+        if precision != "fp16" and not os.path.exists(engine_path):
+            print(f"No {precision} engine for {name} on sm{sm}, falling back to fp16")
+            engine_path = engine_path_for(name, sm)
+        if not os.path.exists(engine_path):
+            return None
+
+        # Map the file instead of reading it into a bytes copy
+        with open(engine_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as serialized:
+            return cls(serialized)
+
+    @property
+    def max_batch_size(self) -> int:
+        """Largest batch a single slot accepts"""
+        return self.input_shape[0]
+
+    @property
+    def input_size(self) -> tuple:
+        """(height, width) the model expects"""
+        return self.input_shape[2], self.input_shape[3]
+
+    @contextmanager
+    def slot(self):
+        """Borrow a free execution slot, blocking until one is available"""
+        slot = self._free_slots.get()
+        try:
+            yield slot
+        finally:
+            self._free_slots.put(slot)